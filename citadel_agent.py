@@ -1,10 +1,60 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from typing import List, Optional, Dict, Any, AsyncIterator, ClassVar, Final, Tuple
 import os
+import sys
+import functools
+import importlib.util
+import json
 from dotenv import load_dotenv
 import asyncio
+import httpx
 from openai import AsyncAzureOpenAI
 
+# Prefer orjson for (de)serializing batch payloads, falling back to the standard library
+try:
+    import orjson
+
+    def _json_dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    _json_loads = json.loads
+
+# Count tokens with tiktoken once its encoding has been loaded (by EchoAgent.initialize, off the
+# event loop since it may be downloaded), otherwise estimate roughly four characters per token
+_encoding: Any = None
+
+
+def _count_tokens(text: str) -> int:
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+
+async def _load_encoding() -> bool:
+    """Load the tiktoken encoding in a worker thread; return whether it was loaded by this call"""
+    global _encoding
+
+    if _encoding is not None:
+        return False
+
+    def load() -> Any:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+
+    try:
+        _encoding = await asyncio.to_thread(load)
+    except Exception:
+        # Not installed or not downloadable right now; keep estimating and retry on the next initialize
+        return False
+    return True
+
 # Load environment variables from .env file
 # Make sure to create a .env file in the project root with the following variables:
 # AZURE_OPENAI_API_KEY - Your Azure OpenAI API key
@@ -13,11 +63,73 @@ from openai import AsyncAzureOpenAI
 # AZURE_OPENAI_DEPLOYMENT_NAME - Your Azure OpenAI deployment name
 load_dotenv()
 
+# Shared HTTP transport and Azure OpenAI clients (one per endpoint and key), reused by every
+# agent so that connections (and their TLS sessions) are kept alive between requests
+_shared_http_client: Optional[httpx.AsyncClient] = None
+_shared_azure_clients: Dict[tuple, AsyncAzureOpenAI] = {}
+_shared_client_lock = asyncio.Lock()
 
-class Message(BaseModel):
+
+@dataclass(slots=True, frozen=True)
+class Message:
     """Model for chat messages"""
-    role: str = Field(..., description="The role of the message sender (system, user, assistant)")
-    content: str = Field(..., description="The content of the message")
+    role: str  # The role of the message sender (system, user, assistant)
+    content: str  # The content of the message
+
+class MessageStore(ABC):
+    """Persistent storage for a chat history"""
+
+    @abstractmethod
+    async def extend(self, messages: List[Dict[str, str]]) -> None:
+        """Append messages to the end of the history, in order"""
+
+    @abstractmethod
+    async def window(self, offset: int, limit: int) -> List[Dict[str, str]]:
+        """Return up to limit messages starting at offset, oldest first"""
+
+    @abstractmethod
+    async def length(self) -> int:
+        """Return the number of stored messages"""
+
+    @abstractmethod
+    async def save_summary(self, content: str, upto: int) -> None:
+        """Store the running summary of the stored messages before index upto"""
+
+    @abstractmethod
+    async def load_summary(self) -> Optional[Tuple[str, int]]:
+        """Return the stored summary and the index it covers up to, if any"""
+
+
+class RedisMessageStore(MessageStore):
+    """Message store backed by a Redis list (redis.asyncio client), one JSON-encoded message per entry"""
+
+    def __init__(self, redis_client: Any, key: str):
+        self.redis = redis_client
+        self.key = key
+
+    async def extend(self, messages: List[Dict[str, str]]) -> None:
+        if messages:
+            await self.redis.rpush(self.key, *[_json_dumps(msg) for msg in messages])
+
+    async def window(self, offset: int, limit: int) -> List[Dict[str, str]]:
+        if limit <= 0:
+            return []
+        return [_json_loads(item) for item in await self.redis.lrange(self.key, offset, offset + limit - 1)]
+
+    async def length(self) -> int:
+        return await self.redis.llen(self.key)
+
+    async def save_summary(self, content: str, upto: int) -> None:
+        await self.redis.hset(f"{self.key}:summary", mapping={"content": content, "upto": upto})
+
+    async def load_summary(self) -> Optional[Tuple[str, int]]:
+        content, upto = await self.redis.hmget(f"{self.key}:summary", "content", "upto")
+        if content is None or upto is None:
+            return None
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        return content, int(upto)
+
 
 class AzureAIConfig(BaseModel):
     """Configuration for Azure OpenAI API"""
@@ -27,106 +139,516 @@ class AzureAIConfig(BaseModel):
     deployment_name: str = Field(..., description="Azure OpenAI deployment name")
 
 
+@functools.lru_cache(maxsize=1)
+def _load_config() -> AzureAIConfig:
+    """Read the Azure OpenAI configuration from the environment once per process"""
+    # Get environment variables without default values
+    api_key = os.getenv("AZURE_OPENAI_API_KEY")
+    api_base = os.getenv("AZURE_OPENAI_API_BASE")
+    api_version = os.getenv("AZURE_OPENAI_API_VERSION")
+    deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
+
+    # Check if any required environment variables are missing
+    missing_vars = []
+    if not api_key:
+        missing_vars.append("AZURE_OPENAI_API_KEY")
+    if not api_base:
+        missing_vars.append("AZURE_OPENAI_API_BASE")
+    if not api_version:
+        missing_vars.append("AZURE_OPENAI_API_VERSION")
+    if not deployment_name:
+        missing_vars.append("AZURE_OPENAI_DEPLOYMENT_NAME")
+
+    if missing_vars:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}. Please check your .env file.")
+
+    return AzureAIConfig(
+        api_key=api_key,
+        api_base=api_base,
+        api_version=api_version,
+        deployment_name=deployment_name
+    )
+
+
+async def get_shared_client(config: AzureAIConfig) -> AsyncAzureOpenAI:
+    """Return the process-wide Azure OpenAI client for config, creating it on first use"""
+    global _shared_http_client
+
+    key = (config.api_base, config.api_key, config.api_version)
+    async with _shared_client_lock:
+        if _shared_http_client is None:
+            _shared_http_client = httpx.AsyncClient(
+                # Multiplex concurrent requests over one connection when h2 (httpx[http2]) is installed
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_keepalive_connections=32,
+                    max_connections=64,
+                    keepalive_expiry=60
+                ),
+                timeout=httpx.Timeout(60, connect=10)
+            )
+        if key not in _shared_azure_clients:
+            _shared_azure_clients[key] = AsyncAzureOpenAI(
+                api_key=config.api_key,
+                api_version=config.api_version,
+                azure_endpoint=config.api_base,
+                http_client=_shared_http_client,
+                # Retries 408/409/429/5xx and connection errors with exponential backoff and jitter
+                max_retries=5
+            )
+        return _shared_azure_clients[key]
+
+
+async def aclose_shared_client() -> None:
+    """Close the shared HTTP connections; agents must be re-initialized afterwards"""
+    global _shared_http_client
+
+    async with _shared_client_lock:
+        _shared_azure_clients.clear()
+        if _shared_http_client is not None:
+            await _shared_http_client.aclose()
+            _shared_http_client = None
+
+
 class EchoAgent(BaseModel):
-    """Simple AI agent that echoes back messages"""
+    """Simple AI agent that echoes back messages.
+
+    Create agents with EchoAgent.create(), which initializes the client; the request
+    methods raise RuntimeError on an agent that was never initialized.
+    """
     messages: List[Message] = Field(default_factory=list, description="Chat history")
     config: Optional[AzureAIConfig] = None
     client: Optional[Any] = None
+    store: Optional[MessageStore] = None  # Where added messages are persisted on flush()
+
+    # Assignments are validated so that replacing messages coerces dicts and resyncs the caches
+    model_config = ConfigDict(arbitrary_types_allowed=True, validate_assignment=True)
+
+    # Append-only context window: it grows from MIN_CONTEXT up to MAX_WINDOW messages before
+    # jumping forward, so the prompt prefix stays stable (and cacheable) between turns
+    MAX_WINDOW: ClassVar[int] = 20
+    MIN_CONTEXT: ClassVar[int] = 10
+    _window_start: int = PrivateAttr(default=0)
+    # Messages added since the last flush() that still have to be written to the store
+    _pending_writes: List[Dict[str, str]] = PrivateAttr(default_factory=list)
+    _store_lock: asyncio.Lock = PrivateAttr(default_factory=asyncio.Lock)
+    # Store index of the message at position 0 after the system prompt, and whether the summary
+    # still has to be written to the store
+    _store_offset: int = PrivateAttr(default=0)
+    _summary_dirty: bool = PrivateAttr(default=False)
+    # Reply parts of a stream_with_ai call that has not finished yet
+    _open_stream: Optional[List[str]] = PrivateAttr(default=None)
+    # Chat history in the dict format expected by the OpenAI API, derived from messages. It is
+    # rebuilt whenever messages is reassigned or changed other than through add_message.
+    _formatted: List[Dict[str, str]] = PrivateAttr(default_factory=list)
+
+    # Once the context sent exceeds MAX_CONTEXT_TOKENS, the oldest messages in the window are
+    # folded into a summary pinned after the system prompt. The window is shrunk to
+    # SUMMARY_TARGET_TOKENS (leaving SUMMARY_RESERVE_TOKENS for the summary) so that
+    # summarizing does not trigger again on the next turn.
+    MAX_CONTEXT_TOKENS: ClassVar[int] = 8000
+    SUMMARY_TARGET_TOKENS: ClassVar[int] = 4000
+    SUMMARY_RESERVE_TOKENS: ClassVar[int] = 500
+    _token_counts: List[int] = PrivateAttr(default_factory=list)
+    _summary: Optional[Dict[str, str]] = PrivateAttr(default=None)
+    _summary_tokens: int = PrivateAttr(default=0)
+    _summarized_upto: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._sync_history()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "messages":
+            self._sync_history()
+
+    def _sync_history(self) -> None:
+        """Rebuild the formatted history and derived state from messages"""
+        self._formatted = [{"role": msg.role, "content": msg.content} for msg in self.messages]
+        self._token_counts = [_count_tokens(msg["content"]) for msg in self._formatted]
+        self._window_start = 0
+        self._summary = None
+        self._summary_tokens = 0
+        self._summarized_upto = 0
+        self._summary_dirty = False
+        self._store_offset = 0
+
+    @classmethod
+    async def create(cls, **kwargs: Any) -> "EchoAgent":
+        """Create an agent with its Azure OpenAI client already initialized"""
+        agent = cls(**kwargs)
+        await agent.initialize()
+        return agent
 
     async def initialize(self) -> None:
         """Initialize the Azure OpenAI client"""
-        if not self.config:
-            # Get environment variables without default values
-            api_key = os.getenv("AZURE_OPENAI_API_KEY")
-            api_base = os.getenv("AZURE_OPENAI_API_BASE")
-            api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-            deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-
-            # Check if any required environment variables are missing
-            missing_vars = []
-            if not api_key:
-                missing_vars.append("AZURE_OPENAI_API_KEY")
-            if not api_base:
-                missing_vars.append("AZURE_OPENAI_API_BASE")
-            if not api_version:
-                missing_vars.append("AZURE_OPENAI_API_VERSION")
-            if not deployment_name:
-                missing_vars.append("AZURE_OPENAI_DEPLOYMENT_NAME")
-
-            if missing_vars:
-                raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}. Please check your .env file.")
-
-            self.config = AzureAIConfig(
-                api_key=api_key,
-                api_base=api_base,
-                api_version=api_version,
-                deployment_name=deployment_name
-            )
-
-        self.client = AsyncAzureOpenAI(
-            api_key=self.config.api_key,
-            api_version=self.config.api_version,
-            azure_endpoint=self.config.api_base
-        )
-
-    async def add_message(self, role: str, content: str) -> None:
+        self.config = self.config or _load_config()
+        self.client = await get_shared_client(self.config)
+        if await _load_encoding():
+            # Replace the estimates made before the encoding was available
+            self._token_counts = [_count_tokens(msg["content"]) for msg in self._formatted]
+            if self._summary:
+                self._summary_tokens = _count_tokens(self._summary["content"])
+
+    def _check_initialized(self, error: Optional[Exception] = None) -> None:
+        """Raise instead of reporting a missing client as an API error.
+
+        The real-time request methods only call this on their error path, so successful
+        requests carry no client check.
+        """
+        if self.client is None:
+            raise RuntimeError("EchoAgent is not initialized; create it with EchoAgent.create() or call initialize()") from error
+
+    def add_message(self, role: str, content: Optional[str]) -> None:
         """Add a message to the chat history"""
-        self.messages.append(Message(role=role, content=content))
+        # Completions can come back without content (e.g. after a content filter hit)
+        if content is None:
+            content = ""
+        tokens = _count_tokens(content)
+        self.messages.append(Message(role, content))
+        self._formatted.append({"role": role, "content": content})
+        self._token_counts.append(tokens)
+        if self.store is not None:
+            self._pending_writes.append({"role": role, "content": content})
+
+    async def flush(self) -> None:
+        """Write messages added since the last flush to the store in a single call"""
+        if self.store is None:
+            return
+        async with self._store_lock:
+            pending = list(self._pending_writes)
+            await self.store.extend(pending)
+            # Only drop what was written; messages added meanwhile stay queued
+            del self._pending_writes[:len(pending)]
+            if self._summary_dirty:
+                await self.store.save_summary(self._summary["content"], self._summarized_upto + self._store_offset)
+                self._summary_dirty = False
+
+    async def _persist(self) -> None:
+        """Flush to the store without failing the request; unwritten messages stay queued for the next flush"""
+        try:
+            await self.flush()
+        except Exception:
+            pass
+
+    async def load_history(self, limit: Optional[int] = None) -> None:
+        """Load the system prompt, the saved summary and the most recent messages from the store"""
+        if self.store is None:
+            raise ValueError("Cannot load history: the agent has no message store")
+
+        if limit is None:
+            limit = self.MAX_WINDOW
+        total = await self.store.length()
+        head = await self.store.window(0, 1)
+        pinned = 1 if head and head[0]["role"] == "system" else 0
+        start = max(total - limit, pinned)
+        # Also load any messages the saved summary does not cover yet, so nothing falls in between
+        saved = await self.store.load_summary()
+        if saved:
+            start = max(min(start, saved[1]), pinned)
+
+        loaded = head[:pinned] + await self.store.window(start, total - start)
+        self.messages = [Message(msg["role"], msg["content"]) for msg in loaded]
+        self._pending_writes = []
+        self._store_offset = start - pinned
+
+        if saved:
+            content, upto = saved
+            self._summary = {"role": "system", "content": content}
+            self._summary_tokens = _count_tokens(content)
+            self._summarized_upto = max(upto - self._store_offset, pinned)
+            self._window_start = self._summarized_upto
+
+    def _close_open_stream(self) -> None:
+        """Record the partial reply of a stream the caller stopped consuming before it finished"""
+        parts, self._open_stream = self._open_stream, None
+        if parts:
+            self.add_message("assistant", "".join(parts))
+        self.add_message("system", "[Response cut off] The response stream was closed before it finished")
+
+    def _pinned(self) -> int:
+        """Return the number of leading messages (the system prompt) that are always sent"""
+        return 1 if self._formatted and self._formatted[0]["role"] == "system" else 0
+
+    async def _summarize_history(self) -> None:
+        """Fold the oldest messages of the window into the summary once the context is over budget"""
+        self._advance_window()
+        pinned = self._pinned()
+        start = max(self._window_start, pinned)
+        head_tokens = sum(self._token_counts[:pinned])
+        if head_tokens + self._summary_tokens + sum(self._token_counts[start:]) <= self.MAX_CONTEXT_TOKENS:
+            return
+
+        # Keep the most recent messages that fit in the target alongside the system prompt and summary
+        budget = self.SUMMARY_TARGET_TOKENS - head_tokens - self.SUMMARY_RESERVE_TOKENS
+        new_start = len(self._formatted)
+        while new_start > start and self._token_counts[new_start - 1] <= budget:
+            new_start -= 1
+            budget -= self._token_counts[new_start]
+
+        # Summarizing cannot bring the context under budget if not even the latest message fits
+        if new_start == len(self._formatted) or new_start == start:
+            return
+
+        older = self._formatted[max(self._summarized_upto, pinned):new_start]
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in older)
+        if self._summary:
+            transcript = f"{self._summary['content']}\n{transcript}"
+
+        # Move the window forward even if summarizing fails so the next turn does not retry it;
+        # the unsummarized messages are picked up by the next summary
+        self._window_start = new_start
+        try:
+            response = await self.client.with_options(max_retries=1).chat.completions.create(
+                model=self.config.deployment_name,
+                messages=[
+                    {"role": "system", "content": "Summarize the following conversation concisely, keeping every fact needed to continue it."},
+                    {"role": "user", "content": transcript}
+                ]
+            )
+            summary = f"Summary of the earlier conversation: {response.choices[0].message.content}"
+        except Exception:
+            return
+
+        self._summary = {"role": "system", "content": summary}
+        self._summary_tokens = _count_tokens(summary)
+        self._summarized_upto = new_start
+        self._summary_dirty = self.store is not None
+
+    def _advance_window(self) -> None:
+        """Jump the window forward once it has grown to MAX_WINDOW messages"""
+        if len(self._formatted) - self._window_start >= self.MAX_WINDOW:
+            self._window_start = len(self._formatted) - self.MIN_CONTEXT
+
+    def _context_messages(self) -> List[Dict[str, str]]:
+        """Return the formatted messages to send, keeping the system prompt and summary pinned"""
+        # messages was changed in place rather than through add_message
+        if len(self.messages) != len(self._formatted):
+            self._sync_history()
+        self._advance_window()
+        if not self._window_start and not self._summary:
+            return self._formatted
+        pinned = self._pinned()
+        summary = [self._summary] if self._summary else []
+        return self._formatted[:pinned] + summary + self._formatted[max(self._window_start, pinned):]
 
     async def echo_message(self, content: str) -> str:
         """Echo back the message received from the user"""
-        await self.add_message("user", content)
+        if self._open_stream is not None:
+            self._close_open_stream()
+        self.add_message("user", content)
+        await self._summarize_history()
         try:
             response = await self.client.chat.completions.create(
                 model=self.config.deployment_name,
-                messages=self.messages
+                messages=self._context_messages()
             )
 
             assistant_message = response.choices[0].message.content
-            await self.add_message("assistant", assistant_message)
-            return assistant_message
+            self.add_message("assistant", assistant_message)
 
         except Exception as e:
-            error_message = f"Error communicating with Azure OpenAI API: {str(e)}"
-            await self.add_message("system", error_message)
-            return error_message
+            self._check_initialized(e)
+            assistant_message = f"Error communicating with Azure OpenAI API: {str(e)}"
+            self.add_message("system", assistant_message)
+
+        await self._persist()
+        return assistant_message
 
     async def process_with_ai(self, content: str) -> str:
         """Process message with Azure OpenAI and return response"""
-        if not self.client:
-            await self.initialize()
+        if self._open_stream is not None:
+            self._close_open_stream()
+        self.add_message("user", content)
+        await self._summarize_history()
 
-        await self.add_message("user", content)
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.config.deployment_name,
+                messages=self._context_messages()
+            )
 
-        # Convert messages to format expected by OpenAI API
-        formatted_messages = [{"role": msg.role, "content": msg.content} for msg in self.messages]
+            assistant_message = response.choices[0].message.content
+            self.add_message("assistant", assistant_message)
 
+        except Exception as e:
+            self._check_initialized(e)
+            assistant_message = f"Error communicating with Azure OpenAI API: {str(e)}"
+            self.add_message("system", assistant_message)
+
+        await self._persist()
+        return assistant_message
+
+    async def stream_with_ai(self, content: str) -> AsyncIterator[str]:
+        """Process message with Azure OpenAI and yield the response as it is generated.
+
+        If the stream fails or the caller stops consuming it early, the partial reply is
+        kept in the history followed by a system note that it was cut off. Callers that stop
+        early should close the generator (aclose() or contextlib.aclosing); otherwise the
+        partial reply is recorded when the next request starts.
+        """
+        if self._open_stream is not None:
+            self._close_open_stream()
+        self.add_message("user", content)
+        await self._summarize_history()
+
+        response = None
+        parts = []
+        self._open_stream = parts
         try:
             response = await self.client.chat.completions.create(
                 model=self.config.deployment_name,
-                messages=formatted_messages
+                messages=self._context_messages(),
+                stream=True
             )
 
-            assistant_message = response.choices[0].message.content
-            await self.add_message("assistant", assistant_message)
-            return assistant_message
+            async for chunk in response:
+                # Azure may send chunks without choices (e.g. content filter results)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+            self._open_stream = None
+            self.add_message("assistant", "".join(parts))
 
         except Exception as e:
+            self._open_stream = None
+            self._check_initialized(e)
             error_message = f"Error communicating with Azure OpenAI API: {str(e)}"
-            await self.add_message("system", error_message)
-            return error_message
+            if parts:
+                self.add_message("assistant", "".join(parts))
+                error_message = f"[Response cut off] {error_message}"
+            self.add_message("system", error_message)
+            yield f"\n{error_message}" if parts else error_message
+
+        finally:
+            # The consumer stopped early (aclose or cancellation) and no other request has
+            # recorded the partial reply yet
+            if self._open_stream is parts:
+                self._close_open_stream()
+            if response is not None:
+                await response.close()
+
+        await self._persist()
+
+    async def process_batch(self, contents: List[str], concurrency: int = 10) -> List[str]:
+        """Process several independent messages concurrently and return the responses in order.
+
+        Each message is answered against the current history only, so, like
+        process_with_ai_batch, the results are not added to the chat history.
+        """
+        if self._open_stream is not None:
+            self._close_open_stream()
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+
+        await self._summarize_history()
+        history = self._context_messages()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def complete(content: str) -> str:
+            async with semaphore:
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.config.deployment_name,
+                        messages=history + [{"role": "user", "content": content}]
+                    )
+                    return response.choices[0].message.content
+                except Exception as e:
+                    self._check_initialized(e)
+                    return f"Error communicating with Azure OpenAI API: {str(e)}"
+
+        return await asyncio.gather(*[complete(content) for content in contents])
+
+    async def process_with_ai_batch(self, prompts: List[str], poll_interval: float = 30.0) -> List[str]:
+        """Run prompts through the Azure OpenAI Batch API and return the responses in order.
+
+        Intended for large offline workloads: results may take up to 24 hours and are not
+        added to the chat history. Requires a Global-Batch deployment.
+        """
+        self._check_initialized()
+        if not prompts:
+            return []
+        if self._open_stream is not None:
+            self._close_open_stream()
+        history = self._context_messages()
+        lines = [
+            _json_dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.config.deployment_name,
+                    "messages": history + [{"role": "user", "content": prompt}]
+                }
+            })
+            for i, prompt in enumerate(prompts)
+        ]
+
+        batch_file = await self.client.files.create(
+            file=("batch.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        # Every file this run creates is removed again so offline jobs leave nothing behind
+        file_ids = [batch_file.id]
+        try:
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/chat/completions",
+                completion_window="24h"
+            )
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(poll_interval)
+                batch = await self.client.batches.retrieve(batch.id)
+
+            # Successful requests are in the output file, failed ones in the error file
+            result_file_ids = [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+            file_ids.extend(result_file_ids)
+
+            if batch.status != "completed":
+                raise RuntimeError(f"Azure OpenAI batch {batch.id} ended with status '{batch.status}'")
+
+            results = ["Error communicating with Azure OpenAI API: no result returned"] * len(prompts)
+            for file_id in result_file_ids:
+                output = await self.client.files.content(file_id)
+                for line in output.text.splitlines():
+                    if not line.strip():
+                        continue
+                    item = _json_loads(line)
+                    index = int(item["custom_id"])
+                    response = item.get("response") or {}
+                    body = response.get("body") or {}
+                    error = item.get("error")
+                    if not error and response.get("status_code") != 200:
+                        error = body.get("error") or f"HTTP {response.get('status_code')}"
+                    if error:
+                        if isinstance(error, dict):
+                            error = error.get("message", error)
+                        results[index] = f"Error communicating with Azure OpenAI API: {error}"
+                    else:
+                        results[index] = body["choices"][0]["message"]["content"]
+
+        finally:
+            for file_id in file_ids:
+                try:
+                    await self.client.files.delete(file_id)
+                except Exception:
+                    pass
+
+        return results
 
     def get_chat_history(self) -> List[Dict[str, str]]:
         """Return the chat history in a simple dict format"""
         return [{"role": msg.role, "content": msg.content} for msg in self.messages]
 
 
-async def main():
-    # Create the agent
-    agent = EchoAgent()
-    await agent.initialize()
-    # Initialize with system message
-    await agent.add_message("system", """You are an Authorization Agent, specialized in handling permission and access control inquiries. Your purpose is to assist users with authorization-related questions ONLY. Do not respond to queries outside the authorization domain.
+# System prompt for the authorization agent. Defined once so every agent sends the identical
+# prefix, which keeps it eligible for prompt caching across sessions.
+SYSTEM_PROMPT: Final[str] = sys.intern("""You are an Authorization Agent, specialized in handling permission and access control inquiries. Your purpose is to assist users with authorization-related questions ONLY. Do not respond to queries outside the authorization domain.
 
 CAPABILITIES:
 1. Query the MCP (Management Control Plane) server to check user permissions
@@ -168,22 +690,41 @@ Your process:
 
 Remember to ONLY answer authorization-related questions. For any other inquiries, politely explain that you're an Authorization Agent and can only assist with permission and access control matters.""")
 
-    # Example usage with simple echo
-    print("Enter your message: ")
-    user_input = input()
-    echo_response = await agent.echo_message(user_input)
-    print(f"User: {user_input}")
-    print(f"Agent: {echo_response}")
-
-    # Uncomment to test with actual Azure OpenAI (requires valid API credentials)
-    # ai_response = await agent.process_with_ai("Tell me about machine learning")
-    # print(f"AI Response: {ai_response}")
 
-    # Print chat history
-    print("\nChat History:")
-    for msg in agent.get_chat_history():
-        print(f"{msg['role'].capitalize()}: {msg['content']}")
+async def main():
+    try:
+        # Create the agent
+        agent = await EchoAgent.create()
+        # Initialize with system message
+        agent.add_message("system", SYSTEM_PROMPT)
+
+        # Example usage with simple echo
+        # Read input on a worker thread so the event loop keeps running meanwhile
+        user_input = await asyncio.to_thread(input, "Enter your message: ")
+        echo_response = await agent.echo_message(user_input)
+        print(f"User: {user_input}")
+        print(f"Agent: {echo_response}")
+
+        # Uncomment to test with actual Azure OpenAI (requires valid API credentials)
+        # ai_response = await agent.process_with_ai("Tell me about machine learning")
+        # print(f"AI Response: {ai_response}")
+
+        # Print chat history
+        print("\nChat History:")
+        for msg in agent.get_chat_history():
+            print(f"{msg['role'].capitalize()}: {msg['content']}")
+    finally:
+        await aclose_shared_client()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Use uvloop's faster event loop where it is available
+    try:
+        import uvloop
+    except ImportError:
+        uvloop = None
+
+    if uvloop is not None and sys.platform != "win32":
+        uvloop.run(main())
+    else:
+        asyncio.run(main())